@@ -1,43 +1,187 @@
 """Agent initialization and management utilities."""
 
+from __future__ import annotations
+
+import hashlib
+import json
 import os
+import threading
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING
 
 import pandas as pd
 import streamlit as st
-from azure.ai.agents.models import ConnectedAgentTool, FilePurpose, FileSearchTool
-from azure.ai.projects import AIProjectClient
 
 import data_utils
+import utils
 from agent_instructions import primary_description, primary_instructions
 
+# The Azure SDK is heavy to import; it is loaded on first use instead
+if TYPE_CHECKING:
+    from azure.ai.projects import AIProjectClient
+
+# Constants
+AGENT_MODEL = "gpt-4o"
+AGENT_NAME_PREFIX = "dinner-planning-agent"
+VECTOR_STORE_NAME_PREFIX = "dingen_vs"
+AGENT_CACHE_PATH = ".dingen_cache.json"
+# Vector store polling backs off from the initial to the max interval and
+# restarts from the initial one whenever indexing progress changes
+POLL_INITIAL_INTERVAL = 0.05
+POLL_MAX_INTERVAL = 1.5
+POLL_BACKOFF_FACTOR = 1.6
+# Chunks keep the SDK default size of 800 tokens and span several NDJSON
+# recipe lines. Only the overlap is lowered from the default 400 tokens,
+# which advances each chunk by 750 instead of 400 tokens and cuts the
+# number of embedded chunks by close to half. The SDK exposes no embedding
+# quantization.
+CHUNK_MAX_TOKENS = 800
+CHUNK_OVERLAP_TOKENS = 50
+# Scalar columns of the normalized frames that define the indexed content;
+# raw_metadata holds dicts, which pandas cannot hash
+HASH_COLUMNS = ["doc_id", "content"]
+
+
+@st.cache_resource(show_spinner=False)
+def get_credential():
+    """Create the Azure credential once per process.
+
+    Sharing one instance keeps its token cache alive across reruns and
+    sessions, so tokens are not re-acquired for every new client. Locally
+    the full DefaultAzureCredential chain is used (environment, Azure CLI,
+    VS Code, ...). When deployed, the developer tool sources are excluded
+    so the chain goes straight to environment, workload or managed identity
+    credentials.
+
+    Returns:
+        A DefaultAzureCredential instance.
+    """
+    from azure.identity import DefaultAzureCredential
+
+    if utils.is_local():
+        return DefaultAzureCredential()
+    return DefaultAzureCredential(
+        exclude_cli_credential=True,
+        exclude_developer_cli_credential=True,
+        exclude_powershell_credential=True,
+        exclude_shared_token_cache_credential=True,
+        exclude_visual_studio_code_credential=True,
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_project_client(
+    endpoint: str, connection_verify: str | None = None
+) -> AIProjectClient:
+    """Create the Azure AI Project client once per process.
+
+    Cached with ``st.cache_resource`` so the credential handshake is not
+    repeated on every Streamlit rerun.
+
+    Args:
+        endpoint: Azure AI project endpoint URL.
+        connection_verify: Optional CA bundle path used for SSL verification.
+
+    Returns:
+        An initialized AIProjectClient.
+    """
+    from azure.ai.projects import AIProjectClient
+
+    connection_kwargs = {
+        "endpoint": endpoint,
+        "credential": get_credential(),
+    }
+    if connection_verify:
+        connection_kwargs["connection_verify"] = connection_verify
+    return AIProjectClient(**connection_kwargs)
+
 
 def get_or_create_agent(
-    project_client: AIProjectClient, combined_df: pd.DataFrame
+    project_client: AIProjectClient, indexed_frames: list[pd.DataFrame]
 ) -> str:
     """Get existing agent or create new one.
 
+    Sessions share the agent built for the same recipe data through a
+    process-wide registry keyed on the content hash. Only the registry is
+    held in ``st.cache_resource``; the agent is built outside it, so the
+    indexing progress is shown live on a miss instead of being replayed
+    on every later hit. The ids
+    are looked up on every rerun rather than trusted from ``session_state``,
+    so when another session deletes the shared resources and clears the
+    cache, this session picks up the replacement on its next rerun.
+
     Args:
         project_client: Azure AI Project client.
-        combined_df: Combined and normalized recipe data.
+        indexed_frames: Normalized recipe and dinner history frames.
 
     Returns:
         Agent ID string.
     """
-    if "agent_id" not in st.session_state:
-        return initialize_agent(project_client, combined_df)
-    return st.session_state["agent_id"]
+    content_hash = compute_content_hash(indexed_frames)
+    registry = _agent_registry()
+    # Serializes creation so concurrent sessions don't build duplicates
+    with registry["lock"]:
+        resources = registry["resources"].get(content_hash)
+        if resources is None or resources["agent_id"] in registry["retired"]:
+            with st.spinner("Initializing AI agent..."):
+                resources = initialize_agent(project_client, indexed_frames)
+            registry["resources"][content_hash] = resources
+    _store_agent_ids(resources)
+    return resources["agent_id"]
 
 
-def initialize_agent(project_client: AIProjectClient, combined_df: pd.DataFrame) -> str:
-    """Initialize agent with vector store and email connection.
+@st.cache_resource(show_spinner=False)
+def _agent_registry() -> dict:
+    """Return the process-wide agent resources, keyed on content hash.
+
+    Returns:
+        Dictionary with a ``lock``, the ``resources`` per content hash and
+        the ``retired`` ids of resources being deleted.
+    """
+    return {"lock": threading.Lock(), "resources": {}, "retired": set()}
+
+
+def is_retired(resource_id: str | None) -> bool:
+    """Return True if a resource id was retired for deletion in this process."""
+    return resource_id in _agent_registry()["retired"]
+
+
+def compute_content_hash(dfs: list[pd.DataFrame]) -> str:
+    """Return a short, stable hash of the contents of several DataFrames.
+
+    Only ``HASH_COLUMNS`` are hashed when present; they determine what ends
+    up in the vector store.
+
+    Args:
+        dfs: DataFrames to hash, in order.
+
+    Returns:
+        12-character hex digest.
+    """
+    digest = hashlib.sha1()
+    for df in dfs:
+        cols = [c for c in HASH_COLUMNS if c in df.columns] or list(df.columns)
+        digest.update(
+            pd.util.hash_pandas_object(df[cols], index=False).values.tobytes()
+        )
+    return digest.hexdigest()[:12]
+
+
+def _agent_tools(project_client: AIProjectClient, vector_store_id: str):
+    """Build the agent tools: file search and, if configured, the email agent.
 
     Args:
         project_client: Azure AI Project client.
-        combined_df: Combined and normalized recipe data.
+        vector_store_id: Vector store searched by the file search tool.
 
     Returns:
-        Agent ID string.
+        Tuple of (tool definitions, tool resources).
     """
+    from azure.ai.agents.models import ConnectedAgentTool, FileSearchTool
+
+    file_search = FileSearchTool(vector_store_ids=[vector_store_id])
+
     # Email agent (A2A connection)
     email_agent_id = os.getenv("email_agent_id")
     if email_agent_id:
@@ -52,36 +196,363 @@ def initialize_agent(project_client: AIProjectClient, combined_df: pd.DataFrame)
         email_tools = []
         st.warning("Email agent not configured")
 
+    return file_search.definitions + email_tools, file_search.resources
+
+
+def _agent_config_hash(tools, tool_resources) -> str:
+    """Return a hash of the agent model, instructions, description and tools."""
+    config = {
+        "model": AGENT_MODEL,
+        "instructions": primary_instructions,
+        "description": primary_description,
+        "tools": sorted(
+            json.dumps(tool.as_dict(), sort_keys=True) for tool in tools
+        ),
+        "tool_resources": tool_resources.as_dict() if tool_resources else None,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def _sync_agent_config(
+    project_client: AIProjectClient, agent, vector_store_id: str
+) -> str:
+    """Update a reused agent only if its stored config hash is outdated.
+
+    Returns:
+        The agent's config hash after syncing.
+    """
+    tools, tool_resources = _agent_tools(project_client, vector_store_id)
+    config_hash = _agent_config_hash(tools, tool_resources)
+    if (agent.metadata or {}).get("config_hash") != config_hash:
+        project_client.agents.update_agent(
+            agent.id,
+            model=AGENT_MODEL,
+            instructions=primary_instructions,
+            description=primary_description,
+            tools=tools,
+            tool_resources=tool_resources,
+            metadata={**(agent.metadata or {}), "config_hash": config_hash},
+        )
+    return config_hash
+
+
+def _deployment_name() -> str:
+    """Return the deployment marker used in resource names and metadata.
+
+    Set ``dingen_deployment`` (e.g. ``main``, ``staging``) so deployments
+    sharing a project and sheet don't reuse, or delete, each other's agent.
+    """
+    default = "local" if utils.is_local() else "default"
+    return os.getenv("dingen_deployment") or default
+
+
+def _resource_names(content_hash: str) -> tuple[str, str]:
+    """Return the (agent, vector store) names for this deployment and data."""
+    deployment = _deployment_name()
+    return (
+        f"{AGENT_NAME_PREFIX}-{deployment}-{content_hash}",
+        f"{VECTOR_STORE_NAME_PREFIX}_{deployment}_{content_hash}",
+    )
+
+
+def _load_agent_cache(endpoint: str) -> dict:
+    """Return cached resource ids for an endpoint from the local cache file."""
+    try:
+        with open(AGENT_CACHE_PATH, encoding="utf-8") as f:
+            return json.load(f).get(endpoint, {})
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _save_agent_cache(endpoint: str, entry: dict | None) -> None:
+    """Store (or remove, when entry is None) cached resource ids for an endpoint."""
+    try:
+        with open(AGENT_CACHE_PATH, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        cache = {}
+
+    if entry is None:
+        cache.pop(endpoint, None)
+    else:
+        cache[endpoint] = entry
+
+    try:
+        with open(AGENT_CACHE_PATH, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+    except OSError:
+        pass
+
+
+def retire_resources(resources: dict[str, str | None]) -> Callable[[], None]:
+    """Stop handing out resources that are about to be deleted.
+
+    The ids are retired at once, so no session reuses them from the cache
+    or by name while the deletes run. The cached entries themselves are
+    only dropped by the returned callable, once the deletes have finished.
+
+    Args:
+        resources: Dictionary with agent_id, vector_store_id and file_id.
+
+    Returns:
+        A callable that forgets the cached entries; safe to call from a
+        worker thread.
+    """
+    registry = _agent_registry()
+    endpoint = os.getenv("dingen_azure_endpoint", "")
+    agent_id = resources.get("agent_id")
+    registry["retired"].update(v for v in resources.values() if v)
+
+    def forget() -> None:
+        with registry["lock"]:
+            for key, cached in list(registry["resources"].items()):
+                if cached["agent_id"] == agent_id:
+                    del registry["resources"][key]
+        if _load_agent_cache(endpoint).get("agent_id") == agent_id:
+            _save_agent_cache(endpoint, None)
+
+    return forget
+
+
+def _find_by_name(items, name: str):
+    """Return the first item whose ``name`` matches and isn't retired, or None."""
+    retired = _agent_registry()["retired"]
+    for item in items:
+        if getattr(item, "name", None) == name and item.id not in retired:
+            return item
+    return None
+
+
+def _store_agent_ids(resources: dict[str, str | None]) -> None:
+    """Store agent resource ids in session state."""
+    for key in ("agent_id", "vector_store_id", "file_id"):
+        if resources.get(key):
+            st.session_state[key] = resources[key]
+        else:
+            st.session_state.pop(key, None)
+
+
+def _vector_store_file_id(project_client: AIProjectClient, vector_store_id: str):
+    """Return the id of the file indexed in a vector store, or None."""
+    for vector_store_file in project_client.agents.vector_store_files.list(
+        vector_store_id=vector_store_id, limit=1
+    ):
+        return vector_store_file.id
+    return None
+
+
+def _reuse_cached_agent(
+    project_client: AIProjectClient, endpoint: str, content_hash: str
+) -> dict[str, str | None] | None:
+    """Reuse a previously created agent for identical recipe data.
+
+    Checks the local cache file first and falls back to looking up the
+    agent and vector store by their hash-derived names. A reused agent is
+    updated only when its model, instructions, description or tools changed.
+
+    Returns:
+        Dictionary with agent_id, vector_store_id and file_id if reusable
+        resources were found, otherwise None.
+    """
+    cached = _load_agent_cache(endpoint)
+    if (
+        cached.get("content_hash") == content_hash
+        and cached.get("deployment") == _deployment_name()
+        and not is_retired(cached.get("agent_id"))
+    ):
+        try:
+            agent = project_client.agents.get_agent(cached["agent_id"])
+            config_hash = _sync_agent_config(
+                project_client, agent, cached["vector_store_id"]
+            )
+            if cached.get("config_hash") != config_hash:
+                cached["config_hash"] = config_hash
+                _save_agent_cache(endpoint, cached)
+            return {
+                "agent_id": agent.id,
+                "vector_store_id": cached["vector_store_id"],
+                "file_id": cached.get("file_id"),
+            }
+        except Exception:
+            _save_agent_cache(endpoint, None)
+
+    agent_name, vector_store_name = _resource_names(content_hash)
+    try:
+        agent = _find_by_name(project_client.agents.list_agents(), agent_name)
+        vector_store = _find_by_name(
+            project_client.agents.vector_stores.list(), vector_store_name
+        )
+    except Exception:
+        return None
+    if agent is None or vector_store is None:
+        return None
+
+    try:
+        config_hash = _sync_agent_config(project_client, agent, vector_store.id)
+        # recover the uploaded file so cleanup can delete it too
+        file_id = _vector_store_file_id(project_client, vector_store.id)
+    except Exception:
+        return None
+
+    resources = {
+        "agent_id": agent.id,
+        "vector_store_id": vector_store.id,
+        "file_id": file_id,
+    }
+    _save_agent_cache(
+        endpoint,
+        {
+            "content_hash": content_hash,
+            "config_hash": config_hash,
+            "deployment": _deployment_name(),
+            **resources,
+        },
+    )
+    return resources
+
+
+def _create_vector_store_with_progress(
+    project_client: AIProjectClient, file_ids: list[str], name: str
+):
+    """Create a vector store and poll it to completion with UI progress.
+
+    Replaces ``create_and_poll`` so the page shows indexing progress instead
+    of a silent spinner while the files are processed. Must not be called
+    from a cached function, or the progress would be replayed on cache hits.
+
+    Args:
+        project_client: Azure AI Project client.
+        file_ids: IDs of uploaded files to index.
+        name: Vector store name.
+
+    Returns:
+        The completed vector store.
+
+    Raises:
+        RuntimeError: If indexing ends in any other state, or no file was
+            indexed.
+    """
+    from azure.ai.agents.models import (
+        VectorStoreStaticChunkingStrategyOptions,
+        VectorStoreStaticChunkingStrategyRequest,
+    )
+
+    vs_client = project_client.agents.vector_stores
+    vector_store = vs_client.create(
+        file_ids=file_ids,
+        name=name,
+        chunking_strategy=VectorStoreStaticChunkingStrategyRequest(
+            static=VectorStoreStaticChunkingStrategyOptions(
+                max_chunk_size_tokens=CHUNK_MAX_TOKENS,
+                chunk_overlap_tokens=CHUNK_OVERLAP_TOKENS,
+            )
+        ),
+    )
+
+    with st.status("Indexing recipes...", expanded=False) as status:
+        bar = st.progress(0.0)
+        delay = POLL_INITIAL_INTERVAL
+        last_done = None
+        while vector_store.status == "in_progress":
+            counts = getattr(vector_store, "file_counts", None)
+            if counts and counts.total:
+                done = counts.completed + counts.failed + counts.cancelled
+                bar.progress(min(done / counts.total, 1.0))
+                if done != last_done:
+                    delay, last_done = POLL_INITIAL_INTERVAL, done
+            time.sleep(delay)
+            delay = min(delay * POLL_BACKOFF_FACTOR, POLL_MAX_INTERVAL)
+            vector_store = vs_client.get(vector_store.id)
+
+        bar.progress(1.0)
+        counts = getattr(vector_store, "file_counts", None)
+        if vector_store.status == "completed" and not (
+            counts and counts.total and not counts.completed
+        ):
+            status.update(label="Recipes indexed", state="complete")
+            return vector_store
+        status.update(
+            label=f"Indexing ended with status {vector_store.status}",
+            state="error",
+        )
+
+    raise RuntimeError(
+        f"Vector store {vector_store.id} ended with status {vector_store.status}"
+    )
+
+
+def initialize_agent(
+    project_client: AIProjectClient, indexed_frames: list[pd.DataFrame]
+) -> dict[str, str | None]:
+    """Initialize agent with vector store and email connection.
+
+    Resources are named after a hash of ``indexed_frames`` so an agent built
+    from identical recipe data is reused instead of re-uploaded.
+
+    Args:
+        project_client: Azure AI Project client.
+        indexed_frames: Normalized recipe and dinner history frames.
+
+    Returns:
+        Dictionary with agent_id, vector_store_id and file_id.
+    """
+    endpoint = os.getenv("dingen_azure_endpoint", "")
+    content_hash = compute_content_hash(indexed_frames)
+    resources = _reuse_cached_agent(project_client, endpoint, content_hash)
+    if resources:
+        return resources
+    agent_name, vector_store_name = _resource_names(content_hash)
+
+    from azure.ai.agents.models import FilePurpose
+
     # File upload and vector store
-    json_path = data_utils.df_to_temp_json(combined_df, ndjson=True)
+    json_path = data_utils.dfs_to_temp_json(indexed_frames, ndjson=True)
     file = project_client.agents.files.upload(
         file_path=json_path, purpose=FilePurpose.AGENTS
     )
     file_id = getattr(file, "id", None) or file.get("id")
 
-    vector_store = project_client.agents.vector_stores.create_and_poll(
-        file_ids=[file_id],
-        name=f"dingen_vectorstore_{int(pd.Timestamp.utcnow().timestamp())}",
-    )
+    try:
+        vector_store = _create_vector_store_with_progress(
+            project_client,
+            file_ids=[file_id],
+            name=vector_store_name,
+        )
+    except RuntimeError:
+        # Don't leave the upload behind; nothing is cached for a failed store
+        project_client.agents.files.delete(file_id)
+        raise
     vector_store_id = getattr(vector_store, "id", None) or vector_store.get("id")
 
-    # Create file search tool
-    file_search = FileSearchTool(vector_store_ids=[vector_store_id])
+    tools, tool_resources = _agent_tools(project_client, vector_store_id)
+    config_hash = _agent_config_hash(tools, tool_resources)
 
     # Create agent
     agent = project_client.agents.create_agent(
-        model="gpt-4o",
-        name="dinner-planning-agent",
+        model=AGENT_MODEL,
+        name=agent_name,
         instructions=primary_instructions,
         description=primary_description,
-        tools=file_search.definitions + email_tools,
-        tool_resources=file_search.resources,
+        tools=tools,
+        tool_resources=tool_resources,
+        metadata={"config_hash": config_hash, "deployment": _deployment_name()},
     )
 
-    # Store in session state
+    # Persist for later sessions
     agent_id = getattr(agent, "id", None) or agent.get("id")
-    st.session_state["agent_id"] = agent_id
-    st.session_state["file_id"] = file_id
-    st.session_state["vector_store_id"] = vector_store_id
+    resources = {
+        "agent_id": agent_id,
+        "vector_store_id": vector_store_id,
+        "file_id": file_id,
+    }
+    _save_agent_cache(
+        endpoint,
+        {
+            "content_hash": content_hash,
+            "config_hash": config_hash,
+            "deployment": _deployment_name(),
+            **resources,
+        },
+    )
 
-    return agent_id
+    return resources
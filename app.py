@@ -1,10 +1,11 @@
+from __future__ import annotations
+
 import os
 import warnings
+from typing import TYPE_CHECKING
 
 import pandas as pd
 import streamlit as st
-from azure.ai.projects import AIProjectClient
-from azure.identity import DefaultAzureCredential
 from dotenv import load_dotenv
 
 import agent_utils
@@ -12,13 +13,16 @@ import chat_utils
 import cleanup_utils
 import data_utils
 import utils
-from streamlit_styles import apply_style_background, apply_style_blur
+from streamlit_styles import apply_styles
+
+if TYPE_CHECKING:
+    from azure.ai.projects import AIProjectClient
 
 if utils.is_local():
     load_dotenv()
     # Use corporate CA bundle for SSL verification
-    corp_cert_path = os.path.expanduser(os.getenv("CORP_CERT_PATH", ""))
-    if corp_cert_path and os.path.exists(corp_cert_path):
+    corp_cert_path = utils.get_corp_cert_path()
+    if corp_cert_path:
         os.environ['SSL_CERT_FILE'] = corp_cert_path
         os.environ['REQUESTS_CA_BUNDLE'] = corp_cert_path
         os.environ['CURL_CA_BUNDLE'] = corp_cert_path
@@ -26,16 +30,25 @@ if utils.is_local():
         warnings.warn("Corporate certificate bundle not found.")
 
 
+@st.fragment
 def render_dinner_plan_page(project_client: AIProjectClient, agent_id: str) -> None:
     """Render the dinner planning chat interface.
 
+    Runs as a fragment, so submitting a chat message reruns only this page
+    and not the data loading, agent setup, or sidebar in ``main``.
+
     Args:
         project_client: An initialized Azure AIProjectClient.
         agent_id: The ID of the AI agent to use for chat interactions.
     """
+    # Another session deleted the shared agent; a full rerun picks up a new one
+    if agent_utils.is_retired(agent_id):
+        st.rerun()
+
     st.title("🤖 AI Dinner Planning Agent 🫜")
 
     chat_utils.initialize_chat_history()
+    chat_utils.display_chat_history()
 
     user_input = st.chat_input(
         "Hi! Let's plan your dinners 😀. Enter your requests here ..."
@@ -44,7 +57,24 @@ def render_dinner_plan_page(project_client: AIProjectClient, agent_id: str) -> N
     if user_input:
         chat_utils.handle_user_input(user_input, project_client, agent_id)
 
-    chat_utils.display_chat_history()
+
+def write_cleanup_status(status: dict[str, str]) -> None:
+    """Write the state of each background delete."""
+    for resource, state in status.items():
+        st.write(f"{resource}: {state}")
+
+
+@st.fragment(run_every=2)
+def render_pending_cleanup_status() -> None:
+    """Poll the background deletes while any is still pending.
+
+    Once all have finished, a full rerun renders the final state without
+    this fragment, which stops the polling.
+    """
+    status = cleanup_utils.get_cleanup_status()
+    if "pending" not in status.values():
+        st.rerun()
+    write_cleanup_status(status)
 
 
 def render_recipe_viewer_page(
@@ -84,13 +114,17 @@ def main() -> None:
     """Main application entry point."""
     st.set_page_config(page_title="Dinner Generator", page_icon="🍲")
 
-    apply_style_background()
-    apply_style_blur()
+    apply_styles()
 
     if st.session_state.get("cleanup_done"):
         st.info(
             "Resources deleted. Please refresh the page to restart the application."
         )
+        status = cleanup_utils.get_cleanup_status()
+        if "pending" in status.values():
+            render_pending_cleanup_status()
+        else:
+            write_cleanup_status(status)
         st.stop()
 
     
@@ -102,31 +136,24 @@ def main() -> None:
         st.stop()
 
     # Configure SSL certificate for local development
-    connection_kwargs = {
-        "endpoint": endpoint,
-        "credential": DefaultAzureCredential(),
-    }
-    
+    connection_verify = None
     if utils.is_local():
-        corp_cert_path = os.path.expanduser(os.getenv("CORP_CERT_PATH", ""))
-        if corp_cert_path and os.path.exists(corp_cert_path):
-            connection_kwargs["connection_verify"] = corp_cert_path
-        else:
+        connection_verify = utils.get_corp_cert_path()
+        if not connection_verify:
             st.warning("⚠️ Corporate certificate not found. SSL verification may fail.")
-    
-    project_client = AIProjectClient(**connection_kwargs)
 
-    with st.spinner("Loading recipe data..."):
-        recipes_data, dinner_history, combined_df = data_utils.prepare_recipe_data()
+    project_client = agent_utils.get_project_client(endpoint, connection_verify)
+
+    recipes_data, dinner_history, indexed_frames = data_utils.prepare_recipe_data(
+        data_utils.current_refresh_key()
+    )
 
-    with st.spinner("Initializing AI agent..."):
-        agent_id = agent_utils.get_or_create_agent(project_client, combined_df)
-        agent = project_client.agents.get_agent(agent_id)
+    agent_id = agent_utils.get_or_create_agent(project_client, indexed_frames)
 
     page = st.sidebar.selectbox("Select a page", ["Create Dinner Plan", "View Recipes"])
 
     if page == "Create Dinner Plan":
-        render_dinner_plan_page(project_client, agent.id)
+        render_dinner_plan_page(project_client, agent_id)
     else:
         render_recipe_viewer_page(recipes_data, dinner_history)
 
@@ -1,102 +1,229 @@
 # chat_utils.py
 """Chat interaction utilities."""
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict, deque
+from collections.abc import Iterator
+from typing import TYPE_CHECKING
+
 import streamlit as st
-from azure.ai.agents.models import ListSortOrder
-from azure.ai.projects import AIProjectClient
 
+if TYPE_CHECKING:
+    from azure.ai.projects import AIProjectClient
+
+# Constants
+RESPONSE_CACHE_SIZE = 32
+# Only the most recent messages are rendered; the Azure thread keeps them all
+CHAT_HISTORY_LIMIT = 40
+# Session state keys that make up one conversation
+# (the response cache is kept, so it survives a reset)
+CONVERSATION_KEYS = ("thread_id", "run_id", "run_status", "chat_history")
+# Run states in which the thread still has an active run
+ACTIVE_RUN_STATUSES = ("queued", "in_progress", "requires_action", "cancelling")
 
-def send_user_message(
-    client: AIProjectClient, agent_id: str, user_message: str
-) -> tuple[str | None, str | None]:
-    """Post a user message to an existing thread (or create one) and start a run.
 
-    This function stores thread and run identifiers in Streamlit ``session_state``
-    so that the conversation persists across reruns.
+def _ensure_thread(client: AIProjectClient, thread_id: str | None = None) -> str:
+    """Return the thread to post to, creating one only when none is known.
 
     Args:
         client: An initialized Azure AIProjectClient.
-        agent_id: The agent identifier to run.
-        user_message: The user's message to post.
+        thread_id: Existing thread identifier, if the caller already has one.
 
     Returns:
-        A tuple (thread_id, run_id). Either may be None on failure.
+        The thread identifier, also stored in ``session_state``.
     """
-    # create thread once per session
-    if "thread_id" not in st.session_state:
-        thread = client.agents.threads.create()
-        st.session_state["thread_id"] = thread.id
-
-    # post user message to that thread
-    client.agents.messages.create(
-        thread_id=st.session_state["thread_id"],
-        role="user",
-        content=user_message,
-    )
+    thread_id = thread_id or st.session_state.get("thread_id")
+    if not thread_id:
+        thread_id = client.agents.threads.create().id
+    st.session_state["thread_id"] = thread_id
+    return thread_id
+
+
+def _active_run_id(client: AIProjectClient, thread_id: str) -> str | None:
+    """Return the id of a run still active on the thread, if any.
+
+    Only a run last seen as active in ``session_state`` (for example one
+    whose stream was cut off by a rerun) is re-checked with the service, so
+    the normal path costs no extra request.
+    """
+    run_id = st.session_state.get("run_id")
+    if not run_id or st.session_state.get("run_status") not in ACTIVE_RUN_STATUSES:
+        return None
+    status = client.agents.runs.get(thread_id=thread_id, run_id=run_id).status
+    st.session_state["run_status"] = status
+    return run_id if status in ACTIVE_RUN_STATUSES else None
 
-    # create and process a run for that message
-    run = client.agents.runs.create_and_process(
-        thread_id=st.session_state["thread_id"],
-        agent_id=agent_id,
-    )
-    st.session_state["run_id"] = getattr(run, "id", None)
-    return st.session_state.get("thread_id"), getattr(run, "id", None)
 
+def stream_user_message(
+    client: AIProjectClient,
+    agent_id: str,
+    user_message: str,
+    thread_id: str | None = None,
+) -> Iterator[str]:
+    """Post a user message and yield the assistant's reply as it is generated.
 
-def get_responses(client: AIProjectClient, thread_id: str, run_id: str) -> list[str]:
-    """Fetch assistant responses for a given thread/run.
+    Uses the run event stream instead of ``create_and_process`` so text can be
+    rendered as soon as the first tokens arrive. The thread and run identifiers
+    are stored in Streamlit ``session_state`` so that the conversation
+    persists across reruns.
 
     Args:
         client: An initialized Azure AIProjectClient.
-        thread_id: The thread identifier.
-        run_id: The run identifier to filter messages by.
+        agent_id: The agent identifier to run.
+        user_message: The user's message to post.
+        thread_id: Existing thread to reuse; skips ``threads.create`` when set.
 
-    Returns:
-        A list of response strings (may be empty).
+    Yields:
+        Text chunks of the assistant response.
+
+    Raises:
+        RuntimeError: If the thread still has an active run, or the run
+            stream reports an error.
+    """
+    thread_id = _ensure_thread(client, thread_id)
+
+    if _active_run_id(client, thread_id):
+        raise RuntimeError("The previous reply is still being generated.")
+
+    yield from _stream_run(client, thread_id, agent_id, user_message)
+
+
+def _stream_run(
+    client: AIProjectClient, thread_id: str, agent_id: str, user_message: str
+) -> Iterator[str]:
+    """Post the user message, start a run and yield its text deltas.
+
+    The message is attached to the run request via ``additional_messages``,
+    so posting it and starting the run take one round-trip instead of a
+    separate ``messages.create`` call. A single streaming connection
+    replaces the status polling done by ``create_and_process``. The run id
+    and status are stored in ``session_state``.
+
+    Raises:
+        RuntimeError: If the run stream reports an error.
     """
-    messages = client.agents.messages.list(
-        thread_id=thread_id, order=ListSortOrder.ASCENDING
+    from azure.ai.agents.models import (
+        AgentStreamEvent,
+        MessageDeltaChunk,
+        ThreadMessageOptions,
+        ThreadRun,
     )
-    responses: list[str] = []
-    for message in messages:
-        if getattr(message, "run_id", None) == run_id and getattr(
-            message, "text_messages", None
-        ):
-            # append the final text value for the message if present
-            text_obj = message.text_messages[-1].text
-            value = getattr(text_obj, "value", None)
-            if value:
-                responses.append(value)
-    return responses
+
+    with client.agents.runs.stream(
+        thread_id=thread_id,
+        agent_id=agent_id,
+        additional_messages=[ThreadMessageOptions(role="user", content=user_message)],
+    ) as stream:
+        for event_type, event_data, _ in stream:
+            if isinstance(event_data, MessageDeltaChunk):
+                if event_data.text:
+                    yield event_data.text
+            elif isinstance(event_data, ThreadRun):
+                st.session_state["run_id"] = event_data.id
+                st.session_state["run_status"] = event_data.status
+            elif event_type == AgentStreamEvent.ERROR:
+                raise RuntimeError(f"Agent run failed: {event_data}")
+
+
+def _normalize_prompt(user_input: str) -> str:
+    """Normalize case, whitespace and trailing punctuation of a prompt."""
+    return " ".join(user_input.lower().split()).rstrip(".!?")
+
+
+def _response_cache_key(user_input: str, agent_id: str) -> str:
+    """Build a cache key from the normalized prompt and the agent.
+
+    The agent id changes whenever the indexed recipe data does, so cached
+    replies never outlive the data they were generated from.
+    """
+    raw = f"{_normalize_prompt(user_input)}|{agent_id}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _record_cached_turn(
+    client: AIProjectClient, user_message: str, response: str
+) -> None:
+    """Add a cached user/assistant turn to the thread so later runs see it.
+
+    Raises:
+        RuntimeError: If the thread still has an active run.
+    """
+    thread_id = _ensure_thread(client, st.session_state.get("thread_id"))
+
+    # messages can't be added while a run is active, same as a new run
+    if _active_run_id(client, thread_id):
+        raise RuntimeError("The previous reply is still being generated.")
+
+    for role, content in (("user", user_message), ("assistant", response)):
+        client.agents.messages.create(
+            thread_id=thread_id, role=role, content=content
+        )
 
 
 def initialize_chat_history() -> None:
-    """Initialize chat history in session state if not already present."""
-    if "chat_history" not in st.session_state:
-        st.session_state["chat_history"] = []
+    """Initialize chat history in session state if not already present.
+
+    The history is a bounded deque so rendering cost stays constant in
+    long conversations.
+    """
+    st.session_state.setdefault("chat_history", deque(maxlen=CHAT_HISTORY_LIMIT))
 
 
 def handle_user_input(
     user_input: str, project_client: AIProjectClient, agent_id: str
 ) -> None:
-    """Handle user input by sending message and processing response.
+    """Handle user input by sending message and streaming the response.
+
+    The user message and the streamed reply are rendered directly, so this
+    must be called after ``display_chat_history`` has drawn earlier turns.
+    Replies to opening prompts are kept in a small per-session LRU cache
+    that survives conversation resets; asking the same opening prompt again
+    is answered from the cache without starting a run. Later prompts depend
+    on the conversation so far and always start a run.
 
     Args:
         user_input: The user's message text.
         project_client: An initialized Azure AIProjectClient.
         agent_id: The agent identifier to run.
     """
+    cache = st.session_state.setdefault("_resp_cache", OrderedDict())
+    cache_key = (
+        None
+        if st.session_state["chat_history"]
+        else _response_cache_key(user_input, agent_id)
+    )
+
     st.session_state["chat_history"].append({"role": "user", "content": user_input})
+    with st.chat_message("user"):
+        st.markdown(user_input)
 
     try:
-        with st.spinner("Sending your request to the agent..."):
-            thread_id, run_id = send_user_message(project_client, agent_id, user_input)
-
-        if thread_id and run_id:
-            responses = get_responses(project_client, thread_id, run_id)
-            for response in responses:
-                st.session_state["chat_history"].append(
-                    {"role": "assistant", "content": response}
+        if cache_key in cache:
+            cache.move_to_end(cache_key)
+            response = cache[cache_key]
+            _record_cached_turn(project_client, user_input, response)
+            with st.chat_message("assistant"):
+                st.markdown(response)
+        else:
+            with st.chat_message("assistant"):
+                response = st.write_stream(
+                    stream_user_message(
+                        project_client,
+                        agent_id,
+                        user_input,
+                        thread_id=st.session_state.get("thread_id"),
+                    )
                 )
+            if response and cache_key:
+                cache[cache_key] = response
+                if len(cache) > RESPONSE_CACHE_SIZE:
+                    cache.popitem(last=False)
+
+        if response:
+            st.session_state["chat_history"].append(
+                {"role": "assistant", "content": response}
+            )
     except Exception as e:
         st.error(f"Error communicating with agent: {e}")
         st.session_state["chat_history"].append(
@@ -114,6 +241,12 @@ def display_chat_history() -> None:
             st.markdown(message["content"])
 
 
+def clear_conversation_state() -> None:
+    """Remove conversation keys from session state."""
+    for key in CONVERSATION_KEYS:
+        st.session_state.pop(key, None)
+
+
 def reset_conversation() -> None:
     """Reset conversation state (thread, run, chat history).
     
@@ -121,7 +254,5 @@ def reset_conversation() -> None:
     the agent or its resources. The agent remains available for
     new conversations.
     """
-    st.session_state.pop("thread_id", None)
-    st.session_state.pop("run_id", None)
-    st.session_state.pop("chat_history", None)
+    clear_conversation_state()
     st.rerun()
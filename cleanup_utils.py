@@ -1,112 +1,186 @@
 # cleanup_utils.py
 """Resource cleanup utilities."""
+from __future__ import annotations
+
+import functools
+import logging
+import uuid
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any
+
 import streamlit as st
-from azure.ai.projects import AIProjectClient
 
+import agent_utils
+import chat_utils
 import utils
 
+if TYPE_CHECKING:
+    from azure.ai.projects import AIProjectClient
+
+logger = logging.getLogger(__name__)
+
+# Session state keys holding ids of Azure resources owned by this session
+RESOURCE_KEYS = ("agent_id", "vector_store_id", "file_id")
+
+# Deletes run here so the UI does not block on Azure round-trips
+_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="cleanup")
+
+# Delete futures per cleanup id; session state only holds the id
+_cleanup_futures: dict[str, dict[str, Future]] = {}
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_vector_store_delete(vs_client_type: type) -> Callable[[Any, str], None]:
+    """Pick the vector store delete method the SDK exposes, once per client type."""
+    # Try different delete methods
+    if hasattr(vs_client_type, "delete_vector_store"):
+        return lambda vs_client, vs_id: vs_client.delete_vector_store(vs_id)
+    if hasattr(vs_client_type, "delete"):
+        return lambda vs_client, vs_id: vs_client.delete(vs_id)
+    if hasattr(vs_client_type, "begin_delete"):
+        return lambda vs_client, vs_id: vs_client.begin_delete(vs_id).result()
+    raise AttributeError(
+        f"No delete method found. Available methods: {dir(vs_client_type)}"
+    )
+
 
-def cleanup_resources(project_client: AIProjectClient) -> dict[str, bool]:
-    """Delete agent, vector store, and file.
+def _delete_vector_store(project_client: AIProjectClient, vector_store_id: str) -> None:
+    """Delete a vector store using whichever delete method the SDK exposes."""
+    vs_client = project_client.agents.vector_stores
+    _resolve_vector_store_delete(type(vs_client))(vs_client, vector_store_id)
+
+
+def _log_result(resource: str, resource_id: str):
+    """Return a done-callback that logs the outcome of a delete."""
+
+    def callback(future: Future) -> None:
+        e = future.exception()
+        if e:
+            logger.error(
+                "Failed to delete %s %s: %s: %s",
+                resource,
+                resource_id,
+                type(e).__name__,
+                e,
+            )
+        else:
+            logger.info("Deleted %s %s", resource, resource_id)
+
+    return callback
+
+
+def cleanup_resources(project_client: AIProjectClient) -> dict[str, Future]:
+    """Schedule deletion of agent, vector store, and file in the background.
 
     Args:
         project_client: Azure AI Project client.
 
     Returns:
-        Dictionary with deletion status for each resource.
+        Dictionary mapping each scheduled resource to its deletion future.
     """
-    deleted = {"agent": False, "vector_store": False, "file": False}
+    futures: dict[str, Future] = {}
 
     # Delete agent
     agent_id = st.session_state.get("agent_id")
     if agent_id:
-        try:
-            project_client.agents.delete_agent(agent_id)
-            deleted["agent"] = True
-            st.write("✓ Agent deleted successfully")
-        except Exception as e:
-            st.error(f"Failed to delete agent {agent_id}: {type(e).__name__}: {e}")
+        futures["agent"] = _executor.submit(
+            project_client.agents.delete_agent, agent_id
+        )
+        futures["agent"].add_done_callback(_log_result("agent", agent_id))
 
     # Delete vector store
     vector_store_id = st.session_state.get("vector_store_id")
     if vector_store_id:
-        try:
-            vs_client = project_client.agents.vector_stores
-
-            # Try different delete methods
-            if hasattr(vs_client, "delete_vector_store"):
-                vs_client.delete_vector_store(vector_store_id)
-            elif hasattr(vs_client, "delete"):
-                vs_client.delete(vector_store_id)
-            elif hasattr(vs_client, "begin_delete"):
-                poller = vs_client.begin_delete(vector_store_id)
-                poller.result()
-            else:
-                raise AttributeError(
-                    f"No delete method found. Available methods: {dir(vs_client)}"
-                )
-
-            deleted["vector_store"] = True
-            st.write("✓ Vector store deleted successfully")
-        except Exception as e:
-            st.error(
-                f"Failed to delete vector store {vector_store_id}: {type(e).__name__}: {e}"
-            )
+        futures["vector_store"] = _executor.submit(
+            _delete_vector_store, project_client, vector_store_id
+        )
+        futures["vector_store"].add_done_callback(
+            _log_result("vector store", vector_store_id)
+        )
 
     # Delete file
     file_id = st.session_state.get("file_id")
     if file_id:
-        try:
-            project_client.agents.files.delete(file_id=file_id)
-            deleted["file"] = True
-            st.write("✓ File deleted successfully")
-        except Exception as e:
-            st.error(f"Failed to delete file {file_id}: {type(e).__name__}: {e}")
+        futures["file"] = _executor.submit(
+            project_client.agents.files.delete, file_id=file_id
+        )
+        futures["file"].add_done_callback(_log_result("file", file_id))
+
+    return futures
 
-    return deleted
+
+def _run_when_done(futures: dict[str, Future], callback: Callable[[], None]) -> None:
+    """Wait for all deletes to finish, then run the callback."""
+    wait(futures.values())
+    callback()
+
+
+def _register_cleanup(futures: dict[str, Future]) -> str:
+    """Keep the futures of a cleanup and return its id.
+
+    Finished cleanups are pruned first, so the registry stays small.
+    """
+    for cleanup_id, registered in list(_cleanup_futures.items()):
+        if all(f.done() for f in registered.values()):
+            _cleanup_futures.pop(cleanup_id, None)
+    cleanup_id = uuid.uuid4().hex
+    _cleanup_futures[cleanup_id] = futures
+    return cleanup_id
+
+
+def get_cleanup_status() -> dict[str, str]:
+    """Return the state of background deletes started in this session.
+
+    Returns:
+        Dictionary mapping resource name to "pending", "deleted" or "failed".
+        Once a finished cleanup is pruned, the last statuses seen are kept
+        in session state.
+    """
+    cleanup_id = st.session_state.get("cleanup_id")
+    futures = _cleanup_futures.get(cleanup_id)
+    if futures is None:
+        return st.session_state.get("cleanup_status", {})
+
+    status = {}
+    for resource, future in futures.items():
+        if not future.done():
+            status[resource] = "pending"
+        elif future.exception():
+            status[resource] = "failed"
+        else:
+            status[resource] = "deleted"
+    st.session_state["cleanup_status"] = status
+    return status
 
 
 def cleanup_and_clear_session(project_client: AIProjectClient) -> None:
     """Cleanup Azure resources and clear all session state.
 
-    This permanently deletes the agent, vector store, and files from
-    Azure, then clears all session state including conversation history.
+    This schedules permanent deletion of the agent, vector store, and files
+    from Azure on a background thread, then clears all session state
+    including conversation history without waiting for the deletes.
     """
-    # Show what we're about to delete
-    resources_to_delete = []
-    if st.session_state.get("agent_id"):
-        resources_to_delete.append(f"agent ({st.session_state.get('agent_id')})")
-    if st.session_state.get("vector_store_id"):
-        resources_to_delete.append(
-            f"vector_store ({st.session_state.get('vector_store_id')})"
-        )
-    if st.session_state.get("file_id"):
-        resources_to_delete.append(f"file ({st.session_state.get('file_id')})")
+    resources = {k: st.session_state.get(k) for k in RESOURCE_KEYS}
+    futures = cleanup_resources(project_client)
 
-    if not resources_to_delete:
+    if not futures:
         st.warning("No resources to delete.")
         return
 
-    deleted = cleanup_resources(project_client)
-
-    # Show summary
-    success_count = sum(deleted.values())
-    st.write(f"Deletion summary: {success_count}/{len(deleted)} resources deleted")
+    # Other sessions stop using the ids now; the cached entries are only
+    # dropped once the deletes are done, so nothing re-finds them meanwhile
+    forget = agent_utils.retire_resources(resources)
+    _executor.submit(_run_when_done, futures, forget)
 
     # Clear session state keys
-    for k in (
-        "agent_id",
-        "vector_store_id",
-        "file_id",
-        "thread_id",
-        "run_id",
-        "chat_history",
-    ):
+    for k in RESOURCE_KEYS:
         st.session_state.pop(k, None)
+    chat_utils.clear_conversation_state()
 
     # Set flag to prevent recreation on rerun
     st.session_state["cleanup_done"] = True
+    st.session_state["cleanup_id"] = _register_cleanup(futures)
 
-    if success_count > 0:
-        st.success("Session cleared. Restarting application...")
-        utils.safe_rerun()
+    st.success("Session cleared. Restarting application...")
+    utils.safe_rerun()
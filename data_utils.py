@@ -1,43 +1,146 @@
 """Data preparation utilities for recipe and dinner history."""
 
+import logging
 import tempfile
+import time
 
+import orjson
 import pandas as pd
 import streamlit as st
 
 import sheets_utils
 
+logger = logging.getLogger(__name__)
+
 # Constants
 DINNER_HISTORY_LIMIT = 14
 RECIPES_WORKSHEET_INDEX = 0
 DINNER_HISTORY_WORKSHEET_INDEX = 2
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+DATA_REFRESH_SECONDS = 3600
+# Sheet columns the agent uses for planning; everything else stays out of the upload
+INDEXED_COLUMNS = [
+    "id",
+    "Recipe",
+    "Time, minutes",
+    "Link",
+    "Season",
+    "Preference",
+    "week",
+    "day",
+]
+
+
+def current_refresh_key() -> int:
+    """Return a value that changes every ``DATA_REFRESH_SECONDS``.
+
+    Passed to ``prepare_recipe_data`` to expire its disk cache, since
+    disk-persisted caches ignore ``ttl``.
+    """
+    return int(time.time() // DATA_REFRESH_SECONDS)
 
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def prepare_recipe_data() -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+@st.cache_data(persist="disk", max_entries=2, show_spinner="Loading recipe data...")
+def prepare_recipe_data(
+    refresh_key: int,
+) -> tuple[pd.DataFrame, pd.DataFrame, list[pd.DataFrame]]:
     """Fetch and normalize recipe and dinner history data.
 
+    The normalized frames are returned separately rather than concatenated,
+    since they are only ever streamed into the upload file. Results are
+    persisted to disk so they survive app restarts; only the current and
+    previous refresh windows are kept.
+
+    Args:
+        refresh_key: Cache-busting key, normally from ``current_refresh_key``.
+
     Returns:
-        Tuple of (recipes_data, dinner_history, combined_normalized_df).
+        Tuple of (recipes_data, dinner_history, indexed_frames).
     """
 
-    recipes_data = sheets_utils.get_recipe_data(worksheet_index=RECIPES_WORKSHEET_INDEX)
-    dinner_history = sheets_utils.get_recipe_data(
-        worksheet_index=DINNER_HISTORY_WORKSHEET_INDEX, limit=DINNER_HISTORY_LIMIT
+    # Both worksheets come back from a single values.batchGet request
+    recipes_data, dinner_history = sheets_utils.get_recipe_data_batch(
+        (
+            (RECIPES_WORKSHEET_INDEX, None),
+            (DINNER_HISTORY_WORKSHEET_INDEX, DINNER_HISTORY_LIMIT),
+        )
     )
 
+    recipes_data = optimize_dtypes(recipes_data)
+    dinner_history = optimize_dtypes(dinner_history)
+
     dinner_history_norm = sheets_utils.normalize_df_for_indexing(
-        dinner_history, source="dinner_history"
+        select_indexed_columns(dinner_history, "dinner_history"),
+        source="dinner_history",
     )
     recipes_data_norm = sheets_utils.normalize_df_for_indexing(
-        recipes_data, source="recipes"
+        select_indexed_columns(recipes_data, "recipes"), source="recipes"
     )
 
-    combined_df = pd.concat(
-        [recipes_data_norm, dinner_history_norm], ignore_index=True, sort=False
-    )
+    indexed_frames = [recipes_data_norm, dinner_history_norm]
+
+    return recipes_data, dinner_history, indexed_frames
+
+
+def select_indexed_columns(df: pd.DataFrame, source: str) -> pd.DataFrame:
+    """Project a sheet onto the columns listed in ``INDEXED_COLUMNS``.
+
+    Falls back to all columns when none of them are present, so a renamed
+    sheet still gets indexed.
+
+    Args:
+        df: Raw sheet DataFrame.
+        source: Source identifier used in the log message.
+
+    Returns:
+        DataFrame limited to the indexed columns.
+    """
+    keep = [c for c in df.columns if c in INDEXED_COLUMNS]
+    if not keep:
+        return df
 
-    return recipes_data, dinner_history, combined_df
+    dropped = [c for c in df.columns if c not in INDEXED_COLUMNS]
+    if dropped:
+        logger.info("Not indexing %s columns: %s", source, ", ".join(map(str, dropped)))
+    return df[keep]
+
+
+def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Downcast column dtypes to shrink memory and serialized size.
+
+    Integer columns (and float columns holding only whole numbers) are
+    downcast to the smallest integer type, so they serialize as ``1`` instead
+    of ``1.0``. Low-cardinality text columns become ``category``; other
+    all-text columns are stored as Arrow-backed strings instead of Python
+    objects.
+
+    Args:
+        df: DataFrame to optimize.
+
+    Returns:
+        A new DataFrame with optimized dtypes.
+    """
+    df = df.copy()
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_integer_dtype(series) or pd.api.types.is_float_dtype(
+            series
+        ):
+            downcast = pd.to_numeric(series, downcast="integer")
+            if pd.api.types.is_integer_dtype(downcast):
+                df[col] = downcast
+        elif (
+            (series.dtype == object or pd.api.types.is_string_dtype(series))
+            and len(series)
+            and series.nunique() / len(series) < CATEGORY_MAX_UNIQUE_RATIO
+        ):
+            df[col] = series.astype("category")
+        elif (
+            series.dtype == object
+            and pd.api.types.infer_dtype(series, skipna=True) == "string"
+        ):
+            df[col] = series.astype("string[pyarrow]")
+    return df
 
 
 def df_to_temp_json(df: pd.DataFrame, ndjson: bool = True) -> str:
@@ -51,10 +154,35 @@ def df_to_temp_json(df: pd.DataFrame, ndjson: bool = True) -> str:
     Returns:
         The file path to the temporary JSON file.
     """
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".json")
-    if ndjson:
-        # orient='records' + lines=True produces NDJSON
-        df.to_json(tmp.name, orient="records", lines=True, force_ascii=False)
-    else:
-        df.to_json(tmp.name, orient="records", force_ascii=False)
+    return dfs_to_temp_json([df], ndjson=ndjson)
+
+
+def dfs_to_temp_json(dfs: list[pd.DataFrame], ndjson: bool = True) -> str:
+    """Serialize several DataFrames into one temporary JSON file.
+
+    Records are written frame after frame, so the frames never need to be
+    concatenated into a single DataFrame first.
+
+    Args:
+        dfs: DataFrames to serialize, in output order.
+        ndjson: If True, writes newline-delimited JSON (one JSON object per line).
+            If False, writes a single JSON array.
+
+    Returns:
+        The file path to the temporary JSON file.
+    """
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".json") as tmp:
+        if ndjson:
+            # encode and write one line per record; no full payload in memory
+            tmp.writelines(
+                orjson.dumps(
+                    r, default=str, option=option | orjson.OPT_APPEND_NEWLINE
+                )
+                for df in dfs
+                for r in df.to_dict(orient="records")
+            )
+        else:
+            records = [r for df in dfs for r in df.to_dict(orient="records")]
+            tmp.write(orjson.dumps(records, default=str, option=option))
     return tmp.name
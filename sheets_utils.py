@@ -1,5 +1,6 @@
 # sheets_utils.py
 import base64
+import hashlib
 import json
 import os
 import tempfile
@@ -8,8 +9,10 @@ import gspread
 import pandas as pd
 import streamlit as st
 from google.oauth2.service_account import Credentials
+from gspread.utils import absolute_range_name, fill_gaps, numericise_all
 
 
+@st.cache_resource(show_spinner=False)
 def _materialize_service_account_file() -> str:
     """Return a filesystem path to the Google service account JSON.
 
@@ -19,7 +22,10 @@ def _materialize_service_account_file() -> str:
       3. google_app_credentials holds base64 of the JSON.
       4. google_app_credentials_json (alt var) with raw or base64 JSON.
 
-    Writes a temp file if needed (cached in st.session_state to avoid duplicates).
+    Writes a temp file if needed, once per process (cached with
+    ``st.cache_resource``). The key is written to a private ``mkstemp`` file
+    and atomically renamed into place, so readers never see a partial file
+    and an existing file at the target path is never trusted.
 
     Returns:
         Filesystem path to the service account JSON file.
@@ -27,10 +33,6 @@ def _materialize_service_account_file() -> str:
     Raises:
         ValueError: If service account key is not provided or invalid.
     """
-    cache_key = "_svc_acct_path"
-    if cache_key in st.session_state:
-        return st.session_state[cache_key]
-
     val_primary = os.getenv("google_app_credentials", "")
     val_alt = os.getenv("google_app_credentials_json", "")
 
@@ -52,7 +54,6 @@ def _materialize_service_account_file() -> str:
 
     # 1. Existing file path?
     if val_primary and os.path.isfile(val_primary):
-        st.session_state[cache_key] = val_primary
         return val_primary
 
     # 2/3: Try primary as JSON / base64
@@ -71,43 +72,34 @@ def _materialize_service_account_file() -> str:
     except json.JSONDecodeError as e:
         raise ValueError(f"Invalid service account JSON: {e}") from e
 
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".json")
-    with open(tmp.name, "w", encoding="utf-8") as f:
-        f.write(json_text)
-    st.session_state[cache_key] = tmp.name
-    return tmp.name
+    digest = hashlib.sha256(json_text.encode("utf-8")).hexdigest()[:16]
+    path = os.path.join(tempfile.gettempdir(), f"gsa-{digest}.json")
+    # mkstemp creates the file exclusively with owner-only permissions
+    fd, tmp_path = tempfile.mkstemp(prefix="gsa-", suffix=".json")
+    try:
+        with open(fd, "w", encoding="utf-8") as f:
+            f.write(json_text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
 
 
-@st.cache_resource
-def get_recipe_data(
-    sheet_id: str | None = None,
-    worksheet_index: int = 0,
-    limit: int | None = None,
-) -> pd.DataFrame:
-    """Fetch Google Sheets data and return it as a pandas DataFrame.
-
-    This is a helper for Streamlit apps dynamic data fetch. It uses a service account
-    JSON key file to authenticate with the Google Sheets API and reads the
-    chosen worksheet into a DataFrame. The function is cached with
-    ``st.cache_resource`` to avoid repeated auth calls during a session.
+def _open_spreadsheet(sheet_id: str | None = None) -> gspread.Spreadsheet:
+    """Authenticate with the service account and open the spreadsheet.
 
     Args:
         sheet_id: Optional Google Sheets ID. If not provided the environment
             variable ``google_sheet_id`` is used.
-        worksheet_index: Index of the worksheet/tab to read (0-based).
-        limit: If provided, return only the last N rows (useful for dinner history).
-
 
     Returns:
-        A pandas DataFrame containing the sheet records. If the sheet is
-        empty, returns an empty DataFrame.
+        The opened gspread Spreadsheet.
 
     Raises:
         FileNotFoundError: If the key file cannot be found.
         ValueError: If required identifiers are missing.
-        Exception: Other errors from the Google API will propagate.
     """
-
     sheet_id = sheet_id or os.getenv("google_sheet_id")
 
     if not sheet_id:
@@ -115,6 +107,21 @@ def get_recipe_data(
 
     KEY_FILE = _materialize_service_account_file()
 
+    if not os.path.exists(KEY_FILE):
+        raise FileNotFoundError(
+            f"Google service account key file not found: {KEY_FILE}"
+        )
+
+    return _get_spreadsheet(KEY_FILE, sheet_id)
+
+
+@st.cache_resource(show_spinner=False)
+def _get_spreadsheet(key_file: str, sheet_id: str) -> gspread.Spreadsheet:
+    """Authorize once per (key_file, sheet_id) and share the opened spreadsheet.
+
+    Loading the key and authorizing the client is redone on every fetch
+    otherwise; the cached Spreadsheet keeps its authorized session.
+    """
     # Google Sheets scope
     scopes = [
         "https://www.googleapis.com/auth/spreadsheets.readonly",
@@ -122,47 +129,87 @@ def get_recipe_data(
     ]
 
     # Authenticate
-    if not os.path.exists(KEY_FILE):
-        raise FileNotFoundError(
-            f"Google service account key file not found: {KEY_FILE}"
-        )
-
-    credentials = Credentials.from_service_account_file(KEY_FILE, scopes=scopes)
+    credentials = Credentials.from_service_account_file(key_file, scopes=scopes)
     client = gspread.authorize(credentials)
+    return client.open_by_key(sheet_id)
 
-    # Open the sheet and select worksheet by index
-    spreadsheet = client.open_by_key(sheet_id)
-    worksheets = spreadsheet.worksheets()
-    if worksheet_index < 0 or worksheet_index >= len(worksheets):
-        raise IndexError(
-            f"worksheet_index {worksheet_index} out of range (0..{len(worksheets)-1})"
-        )
 
-    sheet = worksheets[worksheet_index]
-    # Fetch data based on limit
+def _values_to_dataframe(
+    all_values: list[list], limit: int | None = None
+) -> pd.DataFrame:
+    """Build a DataFrame from raw worksheet values (header row first).
+
+    With ``limit`` only the last N data rows are kept, as text. Without it,
+    numeric cells are converted the same way ``get_all_records`` does.
+
+    Args:
+        all_values: Worksheet rows, header first; rows may be ragged.
+        limit: If provided, keep only the last N data rows.
+
+    Returns:
+        DataFrame of the data rows, or an empty DataFrame if there are none.
+    """
+    if len(all_values) <= 1:  # Only header or empty
+        return pd.DataFrame()
+
+    header, *body = fill_gaps(all_values)
     if limit:
-        # Get all values to find actual data rows (excluding empty rows)
-        all_values = sheet.get_all_values()
-
-        if len(all_values) <= 1:  # Only header or empty
-            data = pd.DataFrame()
-        else:
-            # Get header
-            header = all_values[0]
-            # Get last N data rows, exclude header
-            total_data_rows = len(all_values) - 1
-            if total_data_rows <= limit:
-                # If fewer rows than limit, take all
-                data_rows = all_values[1:]
-            else:
-                data_rows = all_values[-(limit):]
-
-            data = pd.DataFrame(data_rows, columns=header)
-    else:
-        records = sheet.get_all_records()
-        data = pd.DataFrame(records)
+        return pd.DataFrame(body[-limit:], columns=header)
+    return pd.DataFrame([numericise_all(row) for row in body], columns=header)
+
+
+def _worksheet_titles(spreadsheet: gspread.Spreadsheet) -> list[str]:
+    """Return the worksheet titles in tab order.
+
+    Only the titles are requested, instead of the full per-tab metadata
+    that ``worksheets()`` and ``get_worksheet()`` fetch.
+    """
+    metadata = spreadsheet.fetch_sheet_metadata(
+        params={"fields": "sheets.properties.title"}
+    )
+    return [s["properties"]["title"] for s in metadata.get("sheets", [])]
+
+
+def get_recipe_data_batch(
+    worksheet_limits: tuple[tuple[int, int | None], ...],
+    sheet_id: str | None = None,
+) -> list[pd.DataFrame]:
+    """Fetch several worksheets with a single ``values.batchGet`` request.
+
+    All ranges share one spreadsheet open, one titles lookup and one values
+    request. Not cached here: ``data_utils.prepare_recipe_data`` is the one
+    cached entry point and caches the result on its refresh key, so a new
+    key always gets fresh sheet data.
+
+    Args:
+        worksheet_limits: ``(worksheet_index, limit)`` pairs, in output order.
+            A limit keeps only the last N rows (useful for dinner history).
+        sheet_id: Optional Google Sheets ID. If not provided the environment
+            variable ``google_sheet_id`` is used.
 
-    return data
+    Returns:
+        One DataFrame per requested worksheet; empty for an empty sheet.
+
+    Raises:
+        IndexError: If a worksheet index is out of range.
+    """
+    spreadsheet = _open_spreadsheet(sheet_id)
+    titles = _worksheet_titles(spreadsheet)
+    for worksheet_index, _ in worksheet_limits:
+        if worksheet_index < 0 or worksheet_index >= len(titles):
+            raise IndexError(
+                f"worksheet_index {worksheet_index} out of range (0..{len(titles)-1})"
+            )
+
+    ranges = [
+        absolute_range_name(titles[worksheet_index])
+        for worksheet_index, _ in worksheet_limits
+    ]
+    value_ranges = spreadsheet.values_batch_get(ranges).get("valueRanges", [])
+    return [
+        _values_to_dataframe(value_range.get("values", []), limit)
+        for value_range, (_, limit) in zip(value_ranges, worksheet_limits)
+    ]
 
 
 def normalize_df_for_indexing(df: pd.DataFrame, source: str) -> pd.DataFrame:
@@ -206,17 +253,18 @@ def normalize_df_for_indexing(df: pd.DataFrame, source: str) -> pd.DataFrame:
 
     if not text_cols:
         # last resort: stringify entire row
-        df["content"] = df.astype(str).agg(" ".join, axis=1)
-    else:
-        # Fill NaN, cast everything to str, then join
-        df["content"] = (
-            df[text_cols]
-            .fillna("")
-            .apply(lambda row: " ".join(row.astype(str)), axis=1)
-        )
+        text_cols = list(df.columns)
+
+    # Cast each column to string once, fill missing values, then join column-wise
+    parts = [df[c].astype("string").fillna("") for c in text_cols]
+    content = parts[0]
+    for part in parts[1:]:
+        content = content + " " + part
+    df["content"] = content.values
+
     # preserve original metadata as a dict per row (excluding the computed content)
     meta_cols = [c for c in df.columns if c not in ("content",)]
-    df["raw_metadata"] = df[meta_cols].apply(lambda r: r.to_dict(), axis=1)
+    df["raw_metadata"] = df[meta_cols].to_dict(orient="records")
 
     # return only the consistent set of columns expected by your uploader
     return df[["doc_id", "content", "_source", "raw_metadata"]]
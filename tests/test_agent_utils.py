@@ -0,0 +1,30 @@
+import pandas as pd
+
+import agent_utils
+import sheets_utils
+
+
+def _indexed_frames(recipes: list[str]) -> list[pd.DataFrame]:
+    recipes_df = pd.DataFrame(
+        {"id": range(1, len(recipes) + 1), "Recipe": recipes, "Season": "winter"}
+    )
+    history_df = pd.DataFrame({"week": [1], "day": ["Monday"], "Recipe": ["Soup"]})
+    return [
+        sheets_utils.normalize_df_for_indexing(recipes_df, source="recipes"),
+        sheets_utils.normalize_df_for_indexing(history_df, source="dinner_history"),
+    ]
+
+
+def test_compute_content_hash_handles_normalized_frames():
+    content_hash = agent_utils.compute_content_hash(_indexed_frames(["Soup", "Stew"]))
+
+    assert len(content_hash) == 12
+
+
+def test_compute_content_hash_is_stable_and_content_sensitive():
+    first = agent_utils.compute_content_hash(_indexed_frames(["Soup", "Stew"]))
+    again = agent_utils.compute_content_hash(_indexed_frames(["Soup", "Stew"]))
+    changed = agent_utils.compute_content_hash(_indexed_frames(["Soup", "Curry"]))
+
+    assert first == again
+    assert first != changed
@@ -1,11 +1,15 @@
+import functools
 import os
 
 import streamlit as st
 
 
+@functools.lru_cache(maxsize=1)
 def is_local() -> bool:
     """Return True when running in a local/dev environment.
 
+    The filesystem check runs once per process.
+
     Returns:
         True if running locally, False if deployed.
     """
@@ -13,12 +17,28 @@ def is_local() -> bool:
     return not is_deployed
 
 
+@functools.lru_cache(maxsize=1)
+def get_corp_cert_path() -> str | None:
+    """Return the corporate CA bundle path when configured and present.
+
+    Call after the environment is loaded; the result is cached per process.
+
+    Returns:
+        Expanded path from ``CORP_CERT_PATH``, or None if unset or missing.
+    """
+    corp_cert_path = os.path.expanduser(os.getenv("CORP_CERT_PATH", ""))
+    if corp_cert_path and os.path.exists(corp_cert_path):
+        return corp_cert_path
+    return None
+
+
 def safe_rerun() -> None:
-    """Attempt to rerun the Streamlit app, with a safe fallback.
+    """Rerun the Streamlit app, using whichever rerun API is available.
 
-    Tries to use st.rerun(), falls back to stop if that fails.
+    Prefers st.rerun() and falls back to st.experimental_rerun() on old
+    Streamlit versions. If neither exists this is a no-op; callers that
+    need to halt should call st.stop() themselves.
     """
-    try:
-        st.rerun()
-    except Exception:
-        st.stop()
+    rerun = getattr(st, "rerun", None) or getattr(st, "experimental_rerun", None)
+    if rerun:
+        rerun()